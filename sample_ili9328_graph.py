@@ -1,9 +1,7 @@
 #!/usr/bin/env python
-from PIL import Image
+from PIL import Image, ImageDraw
 import time
-import io
 import numpy as np
-import matplotlib.pyplot as plt
 
 from spytft import ili9328
 
@@ -14,17 +12,19 @@ Rectangle area drawing is, for example, the ability to draw
 a 100*100 pixel image at any position on a 240*320 TFT.
 Feature: Since only image data within a rectangular area is
 transferred, screen updates are faster.
-What I did not expect, however, is that matplotlib's
-software rendering is so slow.
+The graph is rasterized directly with numpy and Pillow,
+because matplotlib's software rendering is so slow.
+With use_matplotlib=True, matplotlib (Agg) draws the graph instead.
 '[ja]'=Japanese Comment
 
 [ja]このサンプルは画面内に矩形領域の描画をします.
 [ja]矩形領域のデータ転送のみ行うので高速です.
-[ja]画像はpatplotlibのsin波グラフです.
-[ja]しかし、matplotlibのレンダリングが激遅過ぎて速さがうまく伝わりません...
+[ja]画像はsin波グラフです.
+[ja]matplotlibのレンダリングは激遅なので、numpyとPillowで直接描画します.
+[ja]use_matplotlib=Trueの場合はmatplotlib(Agg)で描画します.
 
 Sample   : draw graph (240*320 pixel)
-    func : draw_graph()
+    func : draw_graph(use_matplotlib=False)
 
 Note:
     Interface : SPI (parallel IO is not supported)
@@ -57,50 +57,96 @@ Author: sh-goto
 #         -------------------------
 #
 #
-def draw_graph():
+def create_graph_image(width, height):
+    """
+    Rasterizes a sine graph directly with numpy and Pillow.
+    """
+    # Create a graph
+    x = np.linspace(0, 2*np.pi, width)
+    y = np.sin(x)
+
+    # [ja]グラフの値をピクセル座標に変換. 上下5ピクセルは余白
+    # Convert the graph values to pixel coordinates.
+    # 5 pixels are left blank at the top and bottom.
+    px = np.arange(width)
+    py = np.rint((height - 1) / 2 * (1 - y * 0.93)).astype(int)
+
+    # [ja]PillowのImageに直接描画する
+    # Draw directly on the Pillow Image object.
+    img = Image.new('RGB', (width, height), color='black')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width - 1, height - 1), outline='white')
+    draw.line((0, (height - 1) // 2, width - 1, (height - 1) // 2),
+              fill='#808080')
+    draw.line(list(zip(px.tolist(), py.tolist())), fill='#8DD3C7', width=2)
+
+    return img
+
+
+def create_matplotlib_graph_image(width, height):
+    """
+    Draws a sine graph with matplotlib(Agg).
+    """
+    # [ja]GUIバックエンドを読み込まないようにAggを使う
+    # Use Agg so that no GUI backend is imported.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.style
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
 
     # Create a graph
-    x = np.linspace(0, 2*np.pi, 200)
+    x = np.linspace(0, 2*np.pi, width)
     y = np.sin(x)
 
     # [ja]200*150ピクセルにするため、dpi=80の場合、figsizeを下記の様に設定
-    # [ja]ただし、正確なピクセル値にはならない.
     # To make 200*150 pixels, if dpi=80, set figsize as follows.
-    # However, it will not be an exact pixel value.
-    plt.figure(figsize=(2.5, 1.875))
-    plt.style.use('dark_background')
-    plt.plot(x, y)
-
-    # [ja]Pillowオブジェクトに変換するため、一時的にバイトストリームに変換
-    # Temporarily converted to a byte stream for conversion to a Pillow object.
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=80)
-    plt.close()
-    buf.seek(0)
-
-    # [ja]PillowのImageオブジェクトに変換
-    # Converted to Pillow Image object
-    img = Image.open(buf)
-    img = img.resize((200, 150))
+    with matplotlib.style.context('dark_background'):
+        fig = Figure(figsize=(width / 80, height / 80), dpi=80)
+        ax = fig.add_subplot(111)
+        ax.plot(x, y)
+
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+
+    # [ja]PNGを経由せず、Aggの描画バッファから直接Pillowに変換
+    # Converted to Pillow Image object directly from the Agg buffer,
+    # without a PNG round trip.
+    canvas_width, canvas_height = canvas.get_width_height()
+    img = Image.frombuffer('RGBA', (canvas_width, canvas_height),
+                           canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
     img = img.convert('RGB')
+    if img.size != (width, height):
+        img = img.resize((width, height))
+
+    return img
 
-    # TFT setting
 
+def draw_graph(use_matplotlib=False):
+
+    # Create a graph(200*150)
+    if use_matplotlib:
+        img = create_matplotlib_graph_image(200, 150)
+    else:
+        img = create_graph_image(200, 150)
+
+    # TFT setting
     # gpio (sysfs I/F)
     RESET_PIN_PATH = '/sys/class/gpio/gpio1023/value'   # for ili9328 reset
-    SPI_CS_PIN_PATH = '/sys/class/gpio/gpio1022/value'  # for spi chip select
+    SPI_CS_PIN_PATH = '/sys/class/gpio/gpio1022/value'  # for spi chip select(GPIO)
     # setting spibus (e.g. /dev/spidev1.0)
     SPI_BUS_NUM = 1
     SPI_DEVICE_NUM = 0
     # MAX 10MHz. But can be overclocked
-    SPI_SPEED_HZ = 1*1000*1000
+    SPI_SPEED_HZ = 8*1000*1000
 
     # Init TFT Display
     tft = ili9328.Ili9328Spi(   spibus    = SPI_BUS_NUM,
                                 spidevice = SPI_DEVICE_NUM,
                                 spi_speed_hz = SPI_SPEED_HZ,
                                 gpio_cs   = SPI_CS_PIN_PATH,
-                                gpio_rst  = RESET_PIN_PATH)
+                                gpio_rst  = RESET_PIN_PATH,
+                                use_hw_cs = False)
 
     # draw background
     background = Image.new('RGB', (240, 320), color='white')
@@ -117,9 +163,11 @@ def draw_graph():
 
     # [ja]画像の向きを逆にする。
     # Reverse the orientation of the image
-    img = img.rotate(180)
+    img = img.transpose(Image.ROTATE_180)
     tft.block_image(20,100, img)
 
+    tft.close()
+
 
 if __name__ == "__main__":
     draw_graph()
\ No newline at end of file
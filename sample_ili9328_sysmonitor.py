@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageFont
 import datetime
 import time
 
@@ -10,10 +10,13 @@ ILI9328 System Monitor sample
 
 This sample draws a screen like a system monitor,
 displaying screen orientation in four directions.
+Texts are drawn on the frame buffer of Ili9328Spi and
+the rendered texts are cached, so redrawing is fast.
 '[ja]'=Japanese Comment
 
 [ja]このサンプルはsystem monitor風の画面を描画します。
 [ja]４方向の画面の向きを表示します。
+[ja]テキストはIli9328Spiのフレームバッファに描画し、キャッシュするので再描画が高速です。
 
 Sample 1 : vertical drawing sample (240*320 pixel)
     func : vertical_drawing_sample()
@@ -23,12 +26,36 @@ Sample 2 : horizontal drawing sample (320*240 pixel)
 
 Note:
     Interface : SPI (parallel IO is not supported)
-    Dependent modules : numpy, spidev
+    Dependent modules : numpy, spidev, Pillow
     Support OS : Linux(The spidev kernel module must be enabled.)
 
 Author: sh-goto
 '''
 
+def draw_glyphs(tft, x, y, text, font, color, prev_text=None, bg=None):
+    '''Draws text glyph by glyph on the frame buffer.
+
+    For strings that change often (e.g. date and time),
+    so that only single glyphs are cached.
+    If prev_text is given, only the glyphs that differ from prev_text
+    are erased with bg and redrawn, so flush() transfers only them.
+    '''
+    height = sum(font.getmetrics())
+    for i, char in enumerate(text):
+        advance = font.getlength(char)
+        if prev_text is not None and i < len(prev_text):
+            if prev_text[i] == char:
+                x += advance
+                continue
+            # [ja]前の文字を背景色で消す
+            # Erase the previous glyph with the background color.
+            tft.fill_rect(round(x), y, round(x + advance) - round(x),
+                          height, bg)
+        if char != ' ':
+            tft.draw_text_cached(round(x), y, char, font, color)
+        x += advance
+
+
 # Sample 1 --------------------------------------------------------
 # ILI9328 vertical drawing sample (240*320 pixel)
 #  O --> X
@@ -62,28 +89,27 @@ def vertical_drawing_sample():
     '''
     # gpio (sysfs I/F)
     RESET_PIN_PATH  = '/sys/class/gpio/gpio1023/value'   # for ili9328 reset
-    SPI_CS_PIN_PATH = '/sys/class/gpio/gpio1022/value'  # for spi chip select
+    SPI_CS_PIN_PATH = '/sys/class/gpio/gpio1022/value'  # for spi chip select(GPIO)
     # setting spibus (e.g. /dev/spidev1.0)
     SPI_BUS_NUM = 1
     SPI_DEVICE_NUM = 0
     # MAX 10MHz. But can be overclocked
-    SPI_SPEED_HZ = 1*1000*1000
+    SPI_SPEED_HZ = 8*1000*1000
 
     # Init TFT Display
     tft = ili9328.Ili9328Spi(   spibus    = SPI_BUS_NUM,
                                 spidevice = SPI_DEVICE_NUM,
                                 spi_speed_hz = SPI_SPEED_HZ,
                                 gpio_cs   = SPI_CS_PIN_PATH,
-                                gpio_rst  = RESET_PIN_PATH)
+                                gpio_rst  = RESET_PIN_PATH,
+                                use_hw_cs = False)
 
-    # [ja]液晶に出力可能なサイズを取得し、画像を新規作成する
+    # [ja]液晶に出力可能なサイズを取得し、背景を塗りつぶす
     # サイズはwidth=240,height=320に固定
-    # Obtain a size that can be output to the LCD and create a new image. 
+    # Obtain a size that can be output to the LCD and fill the background.
     # The size is fixed to width=240,height=320.
     width, height = tft.get_draw_image_size() 
-    image = Image.new('RGB', (width, height), color=(40,40,40))
-
-    draw_image = ImageDraw.Draw(image)
+    tft.fill_rect(0, 0, width, height, (40,40,40))
 
     # [ja]フォントファイルを取得.'./fonts'フォルダにttfを置いている
     # get fontfile. Font files are placed in './fonts'
@@ -101,30 +127,42 @@ def vertical_drawing_sample():
 
     # [ja]テキストを描画する
     # draw texts.
-    draw_image.text((5,    5), date_str,            '#00FF90', font=font_mid)
-    draw_image.text((75,  30), 'powered by sh-goto','#00FF90', font=font_small)
-    draw_image.text((5,   50), 'System Monitor',    '#FFFFFF', font=font_big)
-    draw_image.text((5,  105), 'Temperature',       '#00FFFF', font=font_mid)
-    draw_image.text((210,235), '°C',                '#00FFFF', font=font_mid)
-    draw_image.text((10, 145), '27.9',              '#00FFFF', font=font_large)
-    draw_image.text((11, 260), 'DC12V:12.06V',      '#c0c000', font=font_small)
-    draw_image.text((20, 280), 'Vdd1: 3.28V',       '#c0c000', font=font_small)
-    draw_image.text((20, 300), 'Vdd2: 1.19V',       '#c0c000', font=font_small)
-    draw_image.text((150,260), 'I: 6.5A',           '#c0c000', font=font_small)
-    draw_image.text((150,280), 'P:78.4W',           '#c0c000', font=font_small)
-    draw_image.text((150,300), 'Mode:RUN',          '#00FF90', font=font_small)
-
-    # [ja]画面に表示する。PillowのImageをそのまま渡す
-    # Display on screen. corresponding to the Image object in Pillow.
-    tft.image(image)
-
-    time.sleep(3)
-
-    # [ja]画像の向きを逆にする。
-    # Reverse the orientation of the image
-    image = image.rotate(180)
-
-    tft.image(image)
+    draw_glyphs(tft,       5,   5, date_str,            font_mid,   '#00FF90')
+    tft.draw_text_cached( 75,  30, 'powered by sh-goto',font_small, '#00FF90')
+    tft.draw_text_cached(  5,  50, 'System Monitor',    font_big,   '#FFFFFF')
+    tft.draw_text_cached(  5, 105, 'Temperature',       font_mid,   '#00FFFF')
+    tft.draw_text_cached(210, 235, '°C',                font_mid,   '#00FFFF')
+    tft.draw_text_cached( 10, 145, '27.9',              font_large, '#00FFFF')
+    tft.draw_text_cached( 11, 260, 'DC12V:12.06V',      font_small, '#c0c000')
+    tft.draw_text_cached( 20, 280, 'Vdd1: 3.28V',       font_small, '#c0c000')
+    tft.draw_text_cached( 20, 300, 'Vdd2: 1.19V',       font_small, '#c0c000')
+    tft.draw_text_cached(150, 260, 'I: 6.5A',           font_small, '#c0c000')
+    tft.draw_text_cached(150, 280, 'P:78.4W',           font_small, '#c0c000')
+    tft.draw_text_cached(150, 300, 'Mode:RUN',          font_small, '#00FF90')
+
+    # [ja]フレームバッファを画面に転送する
+    # Transfer the frame buffer to the screen.
+    tft.flush()
+
+    # [ja]時刻を更新する。変化した文字の領域のみ転送される
+    # Update the time. Only the areas of the changed glyphs are transferred.
+    for _ in range(3):
+        time.sleep(1)
+        prev_str = date_str
+        dt_now = datetime.datetime.now(
+            datetime.timezone(datetime.timedelta(hours=9))
+        )
+        date_str = dt_now.strftime('%Y-%m-%d %H:%M:%S')
+        draw_glyphs(tft, 5, 5, date_str, font_mid, '#00FF90',
+                    prev_text=prev_str, bg=(40,40,40))
+        tft.flush()
+
+    # [ja]画像の向きを逆にする。回転はTFT側で行う
+    # Reverse the orientation of the image. The TFT rotates it.
+    tft.set_orientation(180)
+    tft.flush()
+
+    tft.close()
 
 
 
@@ -157,30 +195,29 @@ def horizontal_drawing_sample():
     '''
     # gpio (sysfs I/F)
     RESET_PIN_PATH = '/sys/class/gpio/gpio1023/value'   # for ili9328 reset
-    SPI_CS_PIN_PATH = '/sys/class/gpio/gpio1022/value'  # for spi chip select
+    SPI_CS_PIN_PATH = '/sys/class/gpio/gpio1022/value'  # for spi chip select(GPIO)
     # setting spibus (e.g. /dev/spidev1.0)
     SPI_BUS_NUM = 1
     SPI_DEVICE_NUM = 0
     # MAX 10MHz. But can be overclocked
-    SPI_SPEED_HZ = 1*1000*1000
+    SPI_SPEED_HZ = 8*1000*1000
 
     # Init TFT Display
     tft = ili9328.Ili9328Spi(   spibus    = SPI_BUS_NUM,
                                 spidevice = SPI_DEVICE_NUM,
                                 spi_speed_hz = SPI_SPEED_HZ,
                                 gpio_cs   = SPI_CS_PIN_PATH,
-                                gpio_rst  = RESET_PIN_PATH)
-
-    # [ja]液晶に出力可能な画像サイズを取得.サイズはwidth=240,height=320に固定
-    # Obtain the image size that can be output to the LCD. Size is fixed to width=240,height=320
+                                gpio_rst  = RESET_PIN_PATH,
+                                use_hw_cs = False,
+                                orientation = 90)
+
+    # [ja]液晶に出力可能な画像サイズを取得し、背景を塗りつぶす
+    # [ja]orientation=90なのでwidth=320,height=240. 回転はTFT側で行う
+    # Obtain the image size that can be output to the LCD and fill the background.
+    # With orientation=90 the size is width=320,height=240.
+    # The TFT rotates the image, so no rotation is needed here.
     width, height = tft.get_draw_image_size() 
-
-    # [ja]画像を横向きに描画するため、widthとheightを入れ替えてから画像新規作成
-    # To draw the image horizontally, swap the width and height before creating a new image
-    width_inv  = height
-    height_inv = width
-    image_hrzn = Image.new('RGB', (width_inv, height_inv), color=(40,40,40))
-    draw_image = ImageDraw.Draw(image_hrzn)
+    tft.fill_rect(0, 0, width, height, (40,40,40))
 
     # [ja]フォントファイルを取得.'./fonts'フォルダにttfを置いている
     # get fontfile. Font files are placed in './fonts'
@@ -198,33 +235,32 @@ def horizontal_drawing_sample():
 
     # [ja]テキストを描画する
     # draw texts.
-    draw_image.text((  5,   5), date_str,            '#00FF90', font=font_mid)
-    draw_image.text(( 70,  30), 'powered by sh-goto','#00FF90', font=font_small)
-    draw_image.text((  5,  50), 'System Monitor',    '#FFFFFF', font=font_big)
-    draw_image.text((  5, 105), 'Temperature',       '#00FFFF', font=font_mid)
-    draw_image.text((150, 215), '°C',                '#00FFFF', font=font_mid)
-    draw_image.text((  5, 135), '27.9',              '#00FFFF', font=font_large)
-    draw_image.text((190, 105), 'Status:',           '#C0C000', font=font_mid)
-    draw_image.text((275, 105), 'RUN',               '#00FF90', font=font_mid)
-    draw_image.text((210, 135), 'DC12V:12.1V',       '#C0C000', font=font_small)
-    draw_image.text((210, 155), ' Vdd1: 3.3V',       '#C0C000', font=font_small)
-    draw_image.text((210, 175), ' Vdd2: 1.2V',       '#C0C000', font=font_small)
-    draw_image.text((210, 195), '    I: 8.7A',       '#C0C000', font=font_small)
-    draw_image.text((210, 215), '    P: 105W',       '#C0C000', font=font_small)
-
-    # [ja]縦向きに変更してから、画面に表示する。PillowのImageをそのまま渡す
-    # 320*240 -> 240*320
-    # Change to portrait orientation and then display on the screen,
-    # taking Image of Pillow as argument.
-    image = image_hrzn.rotate(90, expand=True)
-    tft.image(image)
+    draw_glyphs(tft,       5,   5, date_str,            font_mid,   '#00FF90')
+    tft.draw_text_cached( 70,  30, 'powered by sh-goto',font_small, '#00FF90')
+    tft.draw_text_cached(  5,  50, 'System Monitor',    font_big,   '#FFFFFF')
+    tft.draw_text_cached(  5, 105, 'Temperature',       font_mid,   '#00FFFF')
+    tft.draw_text_cached(150, 215, '°C',                font_mid,   '#00FFFF')
+    tft.draw_text_cached(  5, 135, '27.9',              font_large, '#00FFFF')
+    tft.draw_text_cached(190, 105, 'Status:',           font_mid,   '#C0C000')
+    tft.draw_text_cached(275, 105, 'RUN',               font_mid,   '#00FF90')
+    tft.draw_text_cached(210, 135, 'DC12V:12.1V',       font_small, '#C0C000')
+    tft.draw_text_cached(210, 155, ' Vdd1: 3.3V',       font_small, '#C0C000')
+    tft.draw_text_cached(210, 175, ' Vdd2: 1.2V',       font_small, '#C0C000')
+    tft.draw_text_cached(210, 195, '    I: 8.7A',       font_small, '#C0C000')
+    tft.draw_text_cached(210, 215, '    P: 105W',       font_small, '#C0C000')
+
+    # [ja]フレームバッファを画面に転送する
+    # Transfer the frame buffer to the screen.
+    tft.flush()
 
     time.sleep(3)
 
-    # [ja]画像の向きを逆にする
-    # Reverse the orientation of the image
-    image = image.rotate(180)
-    tft.image(image)
+    # [ja]画像の向きを逆にする。回転はTFT側で行う
+    # Reverse the orientation of the image. The TFT rotates it.
+    tft.set_orientation(270)
+    tft.flush()
+
+    tft.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+/*
+ * RGB888 -> RGB565 (upper byte first) packer for ILI9328 GRAM.
+ * Optional C extension of spytft.ili9328. Without it, ili9328 uses
+ * numba or numpy.
+ *
+ * [ja]ARM(NEON)では16pixelずつSIMDで変換する. それ以外はスカラーで変換する
+ * On ARM (NEON), 16 pixels are converted per iteration with SIMD.
+ * Other CPUs use the scalar loop.
+ *
+ * Build (in the repository root):
+ *   $ gcc -O3 -shared -fPIC $(python3-config --includes) \
+ *         spytft/_rgb_pack.c \
+ *         -o spytft/_rgb_pack$(python3-config --extension-suffix)
+ *   32bit ARM (e.g. Raspberry Pi OS armhf) also needs -mfpu=neon.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+
+#if defined(__ARM_NEON) || defined(__ARM_NEON__)
+#include <arm_neon.h>
+#endif
+
+
+static void
+pack_rgb565_be(const uint8_t *src, uint8_t *dst, size_t npix)
+{
+    size_t i = 0;
+
+#if defined(__ARM_NEON) || defined(__ARM_NEON__)
+    for (; i + 16 <= npix; i += 16) {
+        /* [ja]R,G,Bに分けて16pixel読込む */
+        /* Load 16 pixels, deinterleaved into R, G and B. */
+        uint8x16x3_t p = vld3q_u8(src + i * 3);
+        uint8x16x2_t o;
+
+        /* 1st byte: RRRRRGGG = (R >> 3) << 3 | G >> 5 */
+        o.val[0] = vsliq_n_u8(vshrq_n_u8(p.val[1], 5),
+                              vshrq_n_u8(p.val[0], 3), 3);
+        /* 2nd byte: GGGBBBBB = (G >> 2) << 5 | B >> 3 */
+        o.val[1] = vsliq_n_u8(vshrq_n_u8(p.val[2], 3),
+                              vshrq_n_u8(p.val[1], 2), 5);
+
+        /* [ja]2byteを交互に書込む. GRAMの転送形式そのもの */
+        /* Store the 2 bytes interleaved, the GRAM wire format. */
+        vst2q_u8(dst + i * 2, o);
+    }
+#endif
+
+    for (; i < npix; i++) {
+        uint8_t r = src[i * 3];
+        uint8_t g = src[i * 3 + 1];
+        uint8_t b = src[i * 3 + 2];
+        dst[i * 2]     = (uint8_t)((r & 0xF8) | (g >> 5));
+        dst[i * 2 + 1] = (uint8_t)(((g & 0x1C) << 3) | (b >> 3));
+    }
+}
+
+
+static PyObject *
+pack565(PyObject *self, PyObject *args)
+{
+    Py_buffer src, dst;
+    size_t npix;
+
+    if (!PyArg_ParseTuple(args, "y*w*:pack565", &src, &dst)) {
+        return NULL;
+    }
+    if (src.len % 3 != 0) {
+        PyErr_SetString(PyExc_ValueError,
+                        "src length must be a multiple of 3 (RGB888)");
+        goto error;
+    }
+    npix = (size_t)src.len / 3;
+    if ((size_t)dst.len < npix * 2) {
+        PyErr_Format(PyExc_ValueError,
+                     "dst is too small: %zd < %zu", dst.len, npix * 2);
+        goto error;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    pack_rgb565_be((const uint8_t *)src.buf, (uint8_t *)dst.buf, npix);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&src);
+    PyBuffer_Release(&dst);
+    Py_RETURN_NONE;
+
+error:
+    PyBuffer_Release(&src);
+    PyBuffer_Release(&dst);
+    return NULL;
+}
+
+
+static PyMethodDef rgb_pack_methods[] = {
+    {"pack565", pack565, METH_VARARGS,
+     "pack565(src, dst)\n"
+     "--\n\n"
+     "Packs RGB888 bytes (src) into GRAM RGB565 bytes, upper byte first.\n"
+     "dst must be a writable buffer of at least len(src) // 3 * 2 bytes."},
+    {NULL, NULL, 0, NULL}
+};
+
+
+static struct PyModuleDef rgb_pack_module = {
+    PyModuleDef_HEAD_INIT,
+    "_rgb_pack",
+    "RGB888 -> RGB565 packer for ILI9328 GRAM (ARM NEON if available).",
+    -1,
+    rgb_pack_methods
+};
+
+
+PyMODINIT_FUNC
+PyInit__rgb_pack(void)
+{
+    return PyModule_Create(&rgb_pack_module);
+}
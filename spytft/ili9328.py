@@ -3,6 +3,39 @@
 import spidev
 import numpy as np
 import time
+from PIL import Image, ImageColor, ImageDraw
+import warnings
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# [ja]C拡張(spytft/_rgb_pack.c). ビルド方法はソースの先頭を参照
+# C extension (spytft/_rgb_pack.c). See the head of the source to build it.
+try:
+    from . import _rgb_pack
+except ImportError:
+    _rgb_pack = None
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _pack_rgb565(src, dst):
+        """
+        Packs RGB888 (height, width, 3) into GRAM RGB565 (height, width, 2).
+        Optional numba kernel, one pass without temporary arrays.
+        """
+        height, width, _ = src.shape
+        for y in prange(height):
+            for x in range(width):
+                r = src[y, x, 0]
+                g = src[y, x, 1]
+                b = src[y, x, 2]
+                dst[y, x, 0] = (r & 0xF8) | (g >> 5)
+                dst[y, x, 1] = ((g & 0x1C) << 3) | (b >> 3)
+else:
+    _pack_rgb565 = None
 
 class Ili9328Spi:
     """ILITEK ILI9328 SPI library
@@ -10,17 +43,98 @@ class Ili9328Spi:
     It can use Pillow image object on 240*320 TFT.
 
     Interface : SPI (parallel IO is not supported)
-    Dependent modules : numpy, spidev
+    Dependent modules : numpy, spidev, Pillow
+    Optional modules : numba (faster RGB565 conversion)
+                       _rgb_pack C extension (fastest, NEON on ARM)
     OS : Linux(The spidev kernel module must be enabled.)
 
     Author : sh-goto
     """
+    # [ja]初期化シーケンス (レジスタ, データ, 書込み後の待ち時間[s])
+    # Initial sequence (register, data, delay after the write [s])
+    _INIT_SEQ = (
+        # -------------- Start Initial Sequence ----------
+        (0x0001, 0x0100, 0),        # set SS and SM bit
+        (0x0002, 0x0700, 0),        # set 1 line inversion
+        (0x0003, 0x1030, 0),        # set GRAM write direction and BGR=1.
+                                    # (replaced by _ENTRY_MODE[orientation])
+        (0x0004, 0x0000, 0),        # Resize register
+        (0x0008, 0x0207, 0),        # set the back porch and front porch
+        (0x0009, 0x0000, 0),        # set non-display area refresh cycle ISC[3:0]
+        (0x000A, 0x0000, 0),        # FMARK function
+        (0x000C, 0x0000, 0),        # RGB interface setting
+        (0x000D, 0x0000, 0),        # Frame marker Position
+        (0x000F, 0x0000, 0),        # RGB interface polarity
+        # -------------- Power On sequence ---------------
+        (0x0010, 0x0000, 0),        # SAP, BT[3:0], AP, DSTB, SLP, STB
+        (0x0011, 0x0007, 0),        # DC1[2:0], DC0[2:0], VC[2:0]
+        (0x0012, 0x0000, 0),        # VREG1OUT voltage
+        (0x0013, 0x0000, 0),        # VDV[4:0] for VCOM amplitude
+        (0x0007, 0x0001, 0.2),      # Dis-charge capacitor power voltage
+        (0x0010, 0x1490, 0),        # SAP, BT[3:0], AP, DSTB, SLP, STB
+        (0x0011, 0x0227, 0.05),     # DC1[2:0], DC0[2:0], VC[2:0]
+        (0x0012, 0x001C, 0.05),     # Internal reference voltage= Vci;
+        (0x0013, 0x1A00, 0),        # Set VDV[4:0] for VCOM amplitude
+        (0x0029, 0x0025, 0),        # Set VCM[5:0] for VCOMH
+        (0x002B, 0x000C, 0.05),     # Set Frame Rate
+        (0x0020, 0x0000, 0),        # GRAM horizontal Address
+        (0x0021, 0x0000, 0),        # GRAM Vertical Address
+        # -------------- Adjust the Gamma  Curve ---------
+        (0x0030, 0x0000, 0),
+        (0x0031, 0x0506, 0),
+        (0x0032, 0x0104, 0),
+        (0x0035, 0x0207, 0),
+        (0x0036, 0x000F, 0),
+        (0x0037, 0x0306, 0),
+        (0x0038, 0x0102, 0),
+        (0x0039, 0x0707, 0),
+        (0x003C, 0x0702, 0),
+        (0x003D, 0x1604, 0),
+        # -------------- Set GRAM area -------------------
+        (0x0050, 0x0000, 0),        # Horizontal GRAM Start Address
+        (0x0051, 0x00EF, 0),        # Horizontal GRAM End Address
+        (0x0052, 0x0000, 0),        # Vertical GRAM Start Address
+        (0x0053, 0x013F, 0),        # Vertical GRAM End Address
+        (0x0060, 0xA700, 0),        # Gate Scan Line
+        (0x0061, 0x0001, 0),        # NDL,VLE, REV
+        (0x006A, 0x0000, 0),        # set scrolling line
+        # -------------- Partial Display Control ---------
+        (0x0080, 0x0000, 0),
+        (0x0081, 0x0000, 0),
+        (0x0082, 0x0000, 0),
+        (0x0083, 0x0000, 0),
+        (0x0084, 0x0000, 0),
+        (0x0085, 0x0000, 0),
+        # -------------- Panel Control -------------------
+        (0x0090, 0x0010, 0),
+        (0x0092, 0x0600, 0),
+        # -------------- Power On sequence ---------------
+        (0x0007, 0x0133, 0),        # 262K color and display ON
+    )
+
+    # [ja]画面の向き毎のEntry Mode(R03h). BGR=1, AM/I/Dで書込み方向を変える
+    # Entry Mode(R03h) for each orientation. BGR=1, and the AM/I/D bits
+    # set the GRAM write direction so that the panel does the rotation.
+    _ENTRY_MODE = {
+          0: 0x1030,    # AM=0, I/D=11
+         90: 0x1018,    # AM=1, I/D=01
+        180: 0x1000,    # AM=0, I/D=00
+        270: 0x1028,    # AM=1, I/D=10
+    }
+
+    # GRAM write: startbyte RS=0,R/W=W + index R22h, startbyte RS=1,R/W=W
+    _GRAM_HEADER    = b'\x70\x00\x22'
+    _GRAM_STARTBYTE = b'\x72'
+
     def __init__(self,
                  spibus    = 1,
                  spidevice = 0,
-                 spi_speed_hz = 500*1000,
+                 spi_speed_hz = 8*1000*1000,
                  gpio_cs   = '/dev/null',
-                 gpio_rst  = '/dev/null'
+                 gpio_rst  = '/dev/null',
+                 use_hw_cs = None,
+                 orientation = 0,
+                 single_cs_cmd = False
                  ) -> None:
         """
         Sets the SPI interface, SPI-ChipSelect pin and SPI speed.
@@ -31,11 +145,34 @@ class Ili9328Spi:
             spidevice (int): e.g. spidevice=Y -> '/dev/spidevX.Y'
             spi_speed_hz (int): SPI bus clock [Hz]. MAX 10MHz. 
                                 But can be overclocked
+                                Default 8MHz. Lower it if the wiring is
+                                long or the display is corrupted.
             gpio_cs (str):  GPIO for SPI ChipSelect pin.
                             The interface used is SysFs GPIO.
+                            Used only when use_hw_cs=False.
                             e.g. '/sys/class/gpio/gpio1023/value'
             gpio_rst (str): ILI9328 Reset pin. The interface used is SysFs GPIO.
                             e.g. '/sys/class/gpio/gpio1023/value'
+            use_hw_cs (bool): True : ChipSelect is driven by the SPI
+                                     controller (spidev).
+                              False: ChipSelect is driven by gpio_cs.
+                                     For boards where the CS line is
+                                     not connected to the SPI controller.
+                              None : False if gpio_cs is given,
+                                     otherwise True.
+            orientation (int): 0, 90, 180 or 270. Drawing is rotated by
+                               the panel, in the same direction as
+                               Image.rotate(orientation, expand=True).
+                               With 90 and 270 the image size is 320*240.
+            single_cs_cmd (bool): True : A register index and its data are
+                                         sent in one CS window and one
+                                         SPI transfer.
+                                  False: CS is toggled between them,
+                                         as the datasheet specifies.
+                                  Halves the CS toggles of register writes
+                                  on panels that accept the combined form.
+                                  Set it back to False if the display
+                                  stays blank after init.
         """
         # spi config
         self.spibus_num    = spibus
@@ -43,20 +180,92 @@ class Ili9328Spi:
         self.spi_speed_hz  = spi_speed_hz
 
         # gpio config
+        # [ja]gpio_csが指定されていれば、既定ではそのGPIOでCSを駆動する
+        # If gpio_cs is given, CS is driven by that GPIO by default.
+        if use_hw_cs is None:
+            use_hw_cs = (gpio_cs == '/dev/null')
+        elif use_hw_cs and gpio_cs != '/dev/null':
+            warnings.warn(
+                'gpio_cs is ignored because use_hw_cs=True: {}'.format(gpio_cs))
+        self.use_hw_cs    = use_hw_cs
         self.spi_cs_pin   = gpio_cs
         self.reset_pin    = gpio_rst
         self.PIN_ACTIVE   = b'0'
         self.PIN_INACTIVE = b'1'
+        self._single_cs_cmd = single_cs_cmd
         
         # TFT display config
         self.IMAGE_WIDTH  = 240
         self.IMAGE_HEIGHT = 320
         self.BITS_PER_PIXEL = 16 # r=5bit, g=6bit, b=5bit
+        if orientation not in self._ENTRY_MODE:
+            raise ValueError(
+                'orientation must be 0, 90, 180 or 270: {}'.format(orientation))
+        self.ORIENTATION = orientation
+
+        # [ja]GRAM転送バッファ. 先頭はstartbyte, 以降にRGB565を直接書き込む
+        # GRAM transfer buffer. The first byte is the startbyte and
+        # RGB565 data is written directly after it.
+        self._gram_buf = bytearray(
+            1 + self.IMAGE_WIDTH * self.IMAGE_HEIGHT * 2)
+        self._gram_buf[0] = 0x72  #startbyte RS=1,R/W=W
+
+        # [ja]前回image()で表示した画像(RGB565). 差分のあるタイルのみ転送する
+        # Last frame drawn by image() (RGB565).
+        # Only tiles that differ from it are transferred.
+        self.DIFF_TILE_SIZE = 16
+        self._last_rgb565 = None
+        self._next_rgb565 = None
+
+        # [ja]フレームバッファ(RGB565). fill_rect()等で描画し、flush()で転送する
+        # Frame buffer (RGB565). Draw with fill_rect() etc.
+        # and transfer with flush().
+        # [ja]描画した領域は_dirtyに記録し、flush()でその領域のみ転送する
+        # Drawn areas are recorded in _dirty and flush() transfers
+        # only those areas. Areas are merged when the merged rectangle
+        # wastes no more than DIRTY_MERGE_SLACK pixels.
+        self.DIRTY_MERGE_SLACK = 256
+        self._alloc_fb()
+        self.TEXT_CACHE_SIZE = 256
+        self._text_cache = {}
+
+        # [ja]SPIとCSピンは一度だけopenし、以降は使い回す
+        # Open SPI and the CS pin once and reuse them.
+        self.spi = spidev.SpiDev()
+        self.spi.open(self.spibus_num, self.spidevice_num)
+        self.spi.max_speed_hz = self.spi_speed_hz
+        self.spi.mode = 0b11 #spi mode3
+        if self.use_hw_cs:
+            # [ja]CSはspidevが転送毎にアサートする(active-low)
+            # spidev asserts CS for each transfer (active-low).
+            self.spi.no_cs  = False
+            self.spi.cshigh = False
+            self._cs = None
+        else:
+            self._cs = open(self.spi_cs_pin, mode='wb', buffering=0)
+
+        # [ja]spidevの1転送の最大サイズ. GRAMデータはこのサイズ毎に転送する
+        # [ja]全画面を1転送で送るには bufsiz を大きくする
+        # [ja]  e.g. $ sudo modprobe spidev bufsiz=65536
+        # Maximum size of one spidev transfer. GRAM data is sent in chunks
+        # of this size, so that each chunk is a single kernel(DMA) transfer.
+        # To send more data at once, raise spidev.bufsiz.
+        #   e.g. $ sudo modprobe spidev bufsiz=65536
+        self._spi_bufsiz = self._read_spi_bufsiz()
 
         # init TFT
         self.init_ili9328()
 
 
+    @staticmethod
+    def _read_spi_bufsiz():
+        try:
+            with open('/sys/module/spidev/parameters/bufsiz') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 4096  # spidev default
+
+
     def set_spi_speed_hz(self, speed):
         """
         SPI bus clock setting. 
@@ -65,27 +274,127 @@ class Ili9328Spi:
             spi_speed_hz (int): MAX 10MHz. But can be overclocked
         """
         self.spi_speed_hz = speed
+        self.spi.max_speed_hz = speed
+
+
+    def close(self):
+        """
+        Closes SPI and the CS pin.
+        """
+        self.spi.close()
+        if self._cs is not None:
+            self._cs.close()
 
 
     def get_draw_image_size(self):
         """
         Returns the image size that can be transferred to the TFT.
+        With orientation 90 and 270 the width and height are swapped.
 
         Returns:
             int: width
             int: height
         """
+        if self.ORIENTATION in (90, 270):
+            return (self.IMAGE_HEIGHT, self.IMAGE_WIDTH)
         return (self.IMAGE_WIDTH, self.IMAGE_HEIGHT)
 
 
-    def image(self, pil_image):
+    def set_orientation(self, orientation):
+        """
+        Changes the drawing orientation.
+        The whole frame buffer is marked dirty, so the next flush()
+        transfers it again in the new orientation.
+        If the size stays the same (e.g. 0 -> 180), the frame buffer
+        content is kept. If the size changes (e.g. 0 -> 90), the frame
+        buffer is reallocated and cleared to black.
+
+        Args:
+            orientation (int): 0, 90, 180 or 270
+        """
+        if orientation not in self._ENTRY_MODE:
+            raise ValueError(
+                'orientation must be 0, 90, 180 or 270: {}'.format(orientation))
+        size = self.get_draw_image_size()
+        self.ORIENTATION = orientation
+        self.write_cmd(0x0003, self._ENTRY_MODE[orientation])
+        self._last_rgb565 = None
+        self._next_rgb565 = None
+        if size != self.get_draw_image_size():
+            # [ja]サイズが変わる場合はフレームバッファを作り直す(黒で初期化)
+            # The size changes, so the frame buffer is reallocated
+            # (cleared to black).
+            self._alloc_fb()
+
+        # [ja]フレームバッファ全体を新しい向きで再転送する必要がある
+        # The whole frame buffer must be transferred in the new orientation.
+        width, height = self.get_draw_image_size()
+        self._dirty = [(0, 0, width, height)]
+
+
+    def image(self, pil_image, full=False):
         """
         Display images on TFT.
+        Only the tiles that changed since the last call are transferred.
+        block_image(), flush(), write_gram(), write_cmd() and
+        init_ili9328() discard the last frame, so the next call
+        transfers the whole image.
 
         Args:
-            pil_image (PIL.Image): Pillow Image(240*320)
+            pil_image (PIL.Image): Pillow Image of get_draw_image_size()
+                                   (240*320, or 320*240 with
+                                   orientation 90/270).
+                                   Other sizes are drawn at (0, 0)
+                                   by block_image().
+            full (bool): True : Transfers the whole image, e.g. when the
+                                TFT was changed without this library.
+                         False: Transfers only the changed tiles.
         """
-        self.block_image(0, 0, pil_image)
+        if full:
+            self._last_rgb565 = None
+
+        width, height = pil_image.size
+        if (width, height) != self.get_draw_image_size():
+            self.block_image(0, 0, pil_image)
+            return
+
+        # [ja]2枚のフレームバッファを交互に使う
+        # Two frame buffers are used alternately.
+        frame = self._next_rgb565
+        if frame is None or frame.shape != (height, width):
+            frame = np.empty((height, width), dtype='>u2')
+        self._convert_rgb565(
+            pil_image, memoryview(frame.view(np.uint8).reshape(-1)))
+
+        last = self._last_rgb565
+        self._next_rgb565 = last
+        self._last_rgb565 = frame
+
+        if last is None:
+            self._write_block(0, 0, frame)
+            return
+
+        # [ja]タイル単位で差分を取る
+        # Find the tiles that differ from the last frame.
+        tile = self.DIFF_TILE_SIZE
+        tiles_y = -(-height // tile)
+        tiles_x = -(-width  // tile)
+        diff = np.zeros((tiles_y * tile, tiles_x * tile), dtype=bool)
+        np.not_equal(frame, last, out=diff[:height, :width])
+        dirty = diff.reshape(tiles_y, tile, tiles_x, tile).any(axis=(1, 3))
+
+        if dirty.all():
+            self._write_block(0, 0, frame)
+            return
+
+        # [ja]タイル行ごとに、連続した差分タイルをまとめて転送する
+        # For each tile row, transfer consecutive dirty tiles at once.
+        for ty in np.flatnonzero(dirty.any(axis=1)):
+            edges = np.flatnonzero(np.diff(np.r_[0, dirty[ty], 0]))
+            for tx0, tx1 in zip(edges[0::2], edges[1::2]):
+                x0, x1 = tx0 * tile, min(tx1 * tile, width)
+                y0, y1 = ty  * tile, min((ty + 1) * tile, height)
+                self._write_block(x0, y0, frame[y0:y1, x0:x1])
 
 
     def block_image(self, x0, y0, pil_image):
@@ -99,112 +408,514 @@ class Ili9328Spi:
                       of the rectangular area.
             y0 (int): Specifies the X coordinate of the upper left corner
                       of the rectangular area.
-            pil_image (PIL.Image): Pillow Image(240*320)
+            pil_image (PIL.Image): Pillow Image. It must fit within
+                                   get_draw_image_size() from (x0, y0).
         """
-        # Convert from Pillow Image to Numpy array.
-        rgb888 = np.array(pil_image)
+        # [ja]image()の差分元とTFTの表示が一致しなくなるので破棄する
+        # The TFT no longer matches the last frame of image().
+        self._last_rgb565 = None
+
+        width, height = pil_image.size
+        size = width * height * 2
+        self._reserve_gram_buf(size)
 
         # 24bitRGBカラーを16bitカラー(65K)に変換する
         # Convert from RGB888(24bit) to RGB565(16bit)
+        self._convert_rgb565(pil_image, memoryview(self._gram_buf)[1:1 + size])
+
+        self._set_window(x0, y0, width, height)
+
+        # GRAMに転送
+        # write GRAM
+        self._write_gram_buf(size)
+
 
-        ## RGB(24bit)をred=5bit, green=6bit, blue=5bitに分解
-        ## Decompose 24bitRGB into red=5bit, green=6bit, blue=5bit
-        red   = (rgb888[:, :, 0] >> 3).astype(np.uint8)
-        green = (rgb888[:, :, 1] >> 2).astype(np.uint8)
-        blue  = (rgb888[:, :, 2] >> 3).astype(np.uint8)
+    def _write_block(self, x0, y0, rgb565):
+        """
+        Draws a rectangular area from RGB565 pixels.
+
+        Args:
+            x0 (int): X coordinate of the upper left corner.
+            y0 (int): Y coordinate of the upper left corner.
+            rgb565 (numpy.ndarray): big-endian uint16 (height, width)
+        """
+        height, width = rgb565.shape
+        size = width * height * 2
+        self._reserve_gram_buf(size)
+        np.frombuffer(self._gram_buf, dtype='>u2', count=width * height,
+                      offset=1).reshape(height, width)[:] = rgb565
 
-        height, width, _ = rgb888.shape
-        rgb565 = np.zeros((height, width, 2), dtype=np.uint8)
+        self._set_window(x0, y0, width, height)
+        self._write_gram_buf(size)
 
-        ## 1byte目の下位3bitにはgreenの上位3bitを格納し、
-        ## 上位5bitにはredを格納
-        ## The lower 3 bits of the first byte store
-        ## the upper 3 bits of GREEN,and the upper 5 bits store RED.
-        rgb565[:, :, 0] = (red << 3) | (green >> 3)
 
-        ## 2byte目の下位5bitにはblueの値を格納し、
-        ## 上位3bitはgreenの下位3bitを格納
-        ## The lower 5 bits of the second byte store 
-        ## the value of BLUE, and the upper 3 bits store
-        ## the lower 3 bits of GREEN.
-        rgb565[:, :, 1] = (blue) | ((green & 0x07) << 5)
+    def _set_window(self, x0, y0, width, height):
+        draw_width, draw_height = self.get_draw_image_size()
 
         # 長方形描画領域の左上座標を設定
         # Sets the upper left coordinate of the rectangular drawing area.
-        x0 = min(max(x0, 0), (self.IMAGE_WIDTH  - 1))
-        y0 = min(max(y0, 0), (self.IMAGE_HEIGHT - 1))
-        self.write_cmd(0x20, x0) # GRAM horizontal start position
-        self.write_cmd(0x21, y0) # GRAM vertical start position
-        self.write_cmd(0x50, x0) # block area horizontal end position
-        self.write_cmd(0x52, y0) # block area vertical end position
+        x0 = min(max(x0, 0), (draw_width  - 1))
+        y0 = min(max(y0, 0), (draw_height - 1))
 
         # 長方形描画領域の右下座標を設定
         # Set the lower right coordinate of the rectangular drawing area.
-        x = min(max((x0 + width  - 1), 0), (self.IMAGE_WIDTH  - 1))
-        y = min(max((y0 + height - 1), 0), (self.IMAGE_HEIGHT - 1))
-        self.write_cmd(0x51, x) # block area horizontal end position
-        self.write_cmd(0x53, y) # block area vertical end position
+        x = min(max((x0 + width  - 1), 0), (draw_width  - 1))
+        y = min(max((y0 + height - 1), 0), (draw_height - 1))
+
+        # [ja]描画座標をGRAM座標に変換. 書込み開始位置は左上の角
+        # Convert drawing coordinates to GRAM coordinates.
+        # GRAM writing starts at the upper left corner of the drawing.
+        start_x, start_y = self._to_gram_xy(x0, y0)
+        end_x,   end_y   = self._to_gram_xy(x, y)
+
+        self.write_cmds((
+            (0x20, start_x), # GRAM horizontal start position
+            (0x21, start_y), # GRAM vertical start position
+            (0x50, min(start_x, end_x)), # block area horizontal start position
+            (0x52, min(start_y, end_y)), # block area vertical start position
+            (0x51, max(start_x, end_x)), # block area horizontal end position
+            (0x53, max(start_y, end_y)), # block area vertical end position
+        ))
+
+
+    def _to_gram_xy(self, x, y):
+        if self.ORIENTATION == 90:
+            return (y, self.IMAGE_HEIGHT - 1 - x)
+        if self.ORIENTATION == 180:
+            return (self.IMAGE_WIDTH - 1 - x, self.IMAGE_HEIGHT - 1 - y)
+        if self.ORIENTATION == 270:
+            return (self.IMAGE_WIDTH - 1 - y, x)
+        return (x, y)
+
+
+    def _alloc_fb(self):
+        width, height = self.get_draw_image_size()
+        self._fb = bytearray(width * height * 2)
+        self._fb_view = np.frombuffer(self._fb, dtype='>u2').reshape(height, width)
+        self._dirty = []
+
+
+    @staticmethod
+    def color565(color):
+        """
+        Converts a color to RGB565.
+
+        Args:
+            color (int, str or tuple): RGB565 value, or a Pillow color.
+                                       e.g. 0xF800, '#00FF90', (40,40,40)
+
+        Returns:
+            int: RGB565
+        """
+        if isinstance(color, int):
+            return color
+        if isinstance(color, str):
+            color = ImageColor.getrgb(color)
+        r, g, b = color[:3]
+        return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
 
-        # GRAMに転送
-        # write GRAM
-        self.write_gram(rgb565)
+
+    def fill_rect(self, x, y, width, height, color):
+        """
+        Fills a rectangle of the frame buffer.
+
+        Args:
+            x (int): X coordinate of the upper left corner.
+            y (int): Y coordinate of the upper left corner.
+            width (int): width
+            height (int): height
+            color (int, str or tuple): see color565()
+        """
+        rect = self._clip_rect(x, y, width, height)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        self._fb_view[y0:y1, x0:x1] = self.color565(color)
+        self._dirty.append(rect)
+
+
+    def blit_rgb565(self, x, y, tile):
+        """
+        Copies RGB565 pixels to the frame buffer.
+
+        Args:
+            x (int): X coordinate of the upper left corner.
+            y (int): Y coordinate of the upper left corner.
+            tile (numpy.ndarray): RGB565 values (height, width)
+        """
+        height, width = tile.shape
+        rect = self._clip_rect(x, y, width, height)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        self._fb_view[y0:y1, x0:x1] = tile[y0 - y:y1 - y, x0 - x:x1 - x]
+        self._dirty.append(rect)
+
+
+    def blit_rgba(self, x, y, pil_image):
+        """
+        Draws a Pillow Image on the frame buffer, blended by its alpha.
+
+        Args:
+            x (int): X coordinate of the upper left corner.
+            y (int): Y coordinate of the upper left corner.
+            pil_image (PIL.Image): Pillow Image(RGBA)
+        """
+        rgba = np.asarray(pil_image.convert('RGBA'), dtype=np.uint16)
+        self._blend(x, y, rgba[:, :, :3], rgba[:, :, 3])
+
+
+    def draw_text_cached(self, x, y, text, font, color):
+        """
+        Draws text on the frame buffer.
+        The rendered text is cached, so drawing the same text again
+        does not render it with FreeType.
+
+        Args:
+            x (int): Same as ImageDraw.text((x, y), ...)
+            y (int): Same as ImageDraw.text((x, y), ...)
+            text (str): text
+            font (PIL.ImageFont.FreeTypeFont): font
+            color (str or tuple): Pillow color
+        """
+        key = (text, font.path, font.size, color)
+        glyph = self._text_cache.get(key)
+        if glyph is None:
+            _, _, right, bottom = font.getbbox(text)
+            text_image = Image.new('RGBA', (max(right, 1), max(bottom, 1)),
+                                   (0, 0, 0, 0))
+            ImageDraw.Draw(text_image).text((0, 0), text, color, font=font)
+            rgba = np.asarray(text_image, dtype=np.uint16)
+            glyph = (rgba[:, :, :3], rgba[:, :, 3])
+            if len(self._text_cache) >= self.TEXT_CACHE_SIZE:
+                self._text_cache.clear()
+            self._text_cache[key] = glyph
+        self._blend(x, y, *glyph)
+
+
+    def flush(self, x=None, y=None, width=None, height=None):
+        """
+        Transfers the frame buffer to the TFT.
+        Without arguments, only the areas drawn since the last flush()
+        are transferred. Adjacent areas are merged into one transfer.
+        With arguments, the specified rectangle is transferred.
+
+        Args:
+            x (int): X coordinate of the upper left corner.
+            y (int): Y coordinate of the upper left corner.
+            width (int): width. None means up to the right edge.
+            height (int): height. None means up to the bottom edge.
+        """
+        if x is None and y is None and width is None and height is None:
+            rects = self._merge_rects(self._dirty)
+            self._dirty = []
+        else:
+            fb_height, fb_width = self._fb_view.shape
+            x = 0 if x is None else x
+            y = 0 if y is None else y
+            if width is None:
+                width = fb_width - x
+            if height is None:
+                height = fb_height - y
+            rect = self._clip_rect(x, y, width, height)
+            rects = [] if rect is None else [rect]
+        if not rects:
+            return
+
+        # [ja]image()の差分元とTFTの表示が一致しなくなるので破棄する
+        # The TFT no longer matches the last frame of image().
+        self._last_rgb565 = None
+        for x0, y0, x1, y1 in rects:
+            self._write_block(x0, y0, self._fb_view[y0:y1, x0:x1])
+
+
+    def _merge_rects(self, rects):
+        # rects: [(x0, y0, x1, y1), ...]
+        # [ja]結合しても無駄な転送がDIRTY_MERGE_SLACK以下なら1つにまとめる
+        # Merge two rectangles if the merged one transfers no more than
+        # DIRTY_MERGE_SLACK pixels that were not drawn.
+        rects = sorted(rects, key=lambda rect: (rect[1], rect[0]))
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for rect in rects:
+                for i, other in enumerate(result):
+                    union = (min(rect[0], other[0]), min(rect[1], other[1]),
+                             max(rect[2], other[2]), max(rect[3], other[3]))
+                    inter_w = min(rect[2], other[2]) - max(rect[0], other[0])
+                    inter_h = min(rect[3], other[3]) - max(rect[1], other[1])
+                    waste = (self._rect_area(union)
+                             - self._rect_area(rect) - self._rect_area(other)
+                             + max(inter_w, 0) * max(inter_h, 0))
+                    if waste <= self.DIRTY_MERGE_SLACK:
+                        result[i] = union
+                        merged = True
+                        break
+                else:
+                    result.append(rect)
+            rects = result
+        return rects
+
+
+    @staticmethod
+    def _rect_area(rect):
+        return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+    def _clip_rect(self, x, y, width, height):
+        fb_height, fb_width = self._fb_view.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, fb_width), min(y + height, fb_height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return (x0, y0, x1, y1)
+
+
+    def _blend(self, x, y, rgb, alpha):
+        # rgb: uint16 (height, width, 3), alpha: uint16 (height, width)
+        height, width = alpha.shape
+        rect = self._clip_rect(x, y, width, height)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        rgb   = rgb[y0 - y:y1 - y, x0 - x:x1 - x]
+        alpha = alpha[y0 - y:y1 - y, x0 - x:x1 - x, np.newaxis]
+        dst = self._fb_view[y0:y1, x0:x1]
+
+        ## RGB565 -> RGB888
+        bg565 = dst.astype(np.uint16)
+        bg = np.empty(rgb.shape, dtype=np.uint16)
+        bg[:, :, 0] = (bg565 >> 8) & 0xF8
+        bg[:, :, 1] = (bg565 >> 3) & 0xFC
+        bg[:, :, 2] = (bg565 << 3) & 0xF8
+
+        out = (rgb * alpha + bg * (255 - alpha) + 127) // 255
+        dst[:] = (((out[:, :, 0] & 0xF8) << 8)
+                  | ((out[:, :, 1] & 0xFC) << 3)
+                  | (out[:, :, 2] >> 3))
+        self._dirty.append(rect)
+
+
+    def _convert_rgb565(self, pil_image, out):
+        """
+        Converts a Pillow Image to the RGB565 byte stream of GRAM.
+
+        Args:
+            pil_image (PIL.Image): Pillow Image(RGB)
+            out (memoryview): Destination. 2 bytes per pixel,
+                              upper byte first.
+        """
+        if pil_image.mode != 'RGB':
+            pil_image = pil_image.convert('RGB')
+
+        # [ja]C拡張があれば、出力先に直接変換する
+        # If the C extension is built, convert directly into the output.
+        if _rgb_pack is not None:
+            _rgb_pack.pack565(pil_image.tobytes(), out)
+            return
+
+        # [ja]numbaがあれば、JITコンパイルしたカーネルで変換する
+        # If numba is available, convert with the JIT compiled kernel.
+        if _pack_rgb565 is not None:
+            width, height = pil_image.size
+            _pack_rgb565(np.asarray(pil_image),
+                         np.frombuffer(out, dtype=np.uint8)
+                           .reshape(height, width, 2))
+            return
+
+        # [ja]PillowのC実装(BGR;16)で変換できればnumpy配列を作らない
+        # Pillow's C converter(BGR;16) avoids creating a numpy array.
+        # 'BGR;16' is RGB565 little-endian, removed in Pillow 12.
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                rgb565_le = pil_image.convert('BGR;16')
+        except ValueError:
+            rgb565_le = None
+
+        if rgb565_le is not None:
+            ## ILI9328は上位byteから受信するので、byteを入れ替える
+            ## The ILI9328 receives the upper byte first, so swap bytes.
+            src = rgb565_le.tobytes()
+            out[0::2] = src[1::2]
+            out[1::2] = src[0::2]
+            return
+
+        # Convert from Pillow Image to Numpy array. (uint8)
+        rgb888 = np.asarray(pil_image)
+        width, height = pil_image.size
+        rgb565 = np.frombuffer(out, dtype=np.uint8).reshape(height, width, 2)
+
+        # [ja]上位/下位byteはそれぞれuint8に収まるので、uint8のまま
+        # [ja]出力先に直接書き込む(型変換や16bitの一時配列は不要)
+        # Each byte fits in uint8, so compute in uint8 and write
+        # directly to the output. (no astype, no 16bit temporaries)
+
+        ## 1byte目: 上位5bitはRED, 下位3bitはGREENの上位3bit
+        ## 1st byte: upper 5 bits are RED, lower 3 bits are
+        ## the upper 3 bits of GREEN.
+        np.bitwise_and(rgb888[:, :, 0], 0xF8, out=rgb565[:, :, 0])
+        rgb565[:, :, 0] |= rgb888[:, :, 1] >> 5
+
+        ## 2byte目: 上位3bitはGREENの下位3bit, 下位5bitはBLUE
+        ## 2nd byte: upper 3 bits are the lower 3 bits of GREEN,
+        ## lower 5 bits are BLUE.
+        np.bitwise_and(rgb888[:, :, 1], 0x1C, out=rgb565[:, :, 1])
+        rgb565[:, :, 1] <<= 3
+        rgb565[:, :, 1] |= rgb888[:, :, 2] >> 3
 
 
     def write_cmd(self, regaddr, data16):
-        # init spi
-        spi = spidev.SpiDev()
-        spi.open(self.spibus_num, self.spidevice_num)
-        spi.max_speed_hz = self.spi_speed_hz
-        spi.mode = 0b11 #spi mode3
-
-        with open(self.spi_cs_pin, mode='wb',buffering=0) as cs_pin:
-            # set reg index
-            cs_pin.write(self.PIN_ACTIVE)
-            send_data = [0x70]  #startbyte RS=0,R/W=W
-            send_data.extend(
-                list(regaddr.to_bytes(2,byteorder='big')))
-            spi.writebytes(send_data)
-            cs_pin.write(self.PIN_INACTIVE)
-
-            # set reg data
-            cs_pin.write(self.PIN_ACTIVE)
-            send_data = [0x72]  #startbyte RS=1,R/W=W
-            send_data.extend(
-                list(data16.to_bytes(2,byteorder='big')))
-            spi.writebytes(send_data)
-            cs_pin.write(self.PIN_INACTIVE)
-
-        spi.close()
-
-
-    def write_gram(self, image_array):
-        # init spi
-        spi = spidev.SpiDev()
-        spi.open(self.spibus_num, self.spidevice_num)
-        spi.max_speed_hz = self.spi_speed_hz
-        spi.mode = 0b11 #spi mode3
-
-        with open(self.spi_cs_pin, mode='wb',buffering=0) as cs_pin:
-            # set reg index
-            cs_pin.write(self.PIN_ACTIVE)
-            send_data = [0x70, 0x00, 0x22]  #startbyte RS=0,R/W=W
-            spi.writebytes(send_data)
-            cs_pin.write(self.PIN_INACTIVE)
-
-            # send GRAM data
-            cs_pin.write(self.PIN_ACTIVE)
-            ## startbyte RS=1,R/W=W
-            send_data = np.insert(image_array, 0, 0x72)
-            spi.writebytes2(send_data)
-            cs_pin.write(self.PIN_INACTIVE)
-
-        spi.close()
+        """
+        Writes 16bit data to a register.
+
+        Args:
+            regaddr (int): register index
+            data16 (int): register data
+        """
+        # [ja]image()の差分元とTFTの表示が一致しなくなるので破棄する
+        # The TFT may no longer match the last frame of image().
+        self._last_rgb565 = None
+        self._write_cmd_pair(regaddr, data16)
+
+
+    def write_cmds(self, cmds):
+        """
+        Writes a sequence of registers.
+
+        Args:
+            cmds (iterable): (regaddr, data16) pairs
+        """
+        for regaddr, data16 in cmds:
+            self._write_cmd_pair(regaddr, data16)
+
+
+    def _write_cmd_pair(self, regaddr, data16):
+        writebytes = self.spi.writebytes2
+        if self._single_cs_cmd:
+            # [ja]RSはstartbyte毎に判定されるので、1回のCSで続けて送る
+            # RS is sampled at each startbyte, so the index and the data
+            # are sent back to back in one CS window.
+            pair = bytes((0x70, regaddr >> 8, regaddr & 0xFF,
+                          0x72, data16 >> 8, data16 & 0xFF))
+            if self._cs is None:
+                writebytes(pair)
+                return
+            self._cs.write(self.PIN_ACTIVE)
+            writebytes(pair)
+            self._cs.write(self.PIN_INACTIVE)
+            return
+
+        # startbyte RS=0,R/W=W + reg index
+        cmd = bytes((0x70, regaddr >> 8, regaddr & 0xFF))
+        # startbyte RS=1,R/W=W + reg data
+        dat = bytes((0x72, data16 >> 8, data16 & 0xFF))
+
+        # [ja]startbyteはCSの立下り毎に必要なので、CSは2回トグルする
+        # A startbyte is required after every CS falling edge,
+        # so CS is toggled twice.
+        if self._cs is None:
+            writebytes(cmd)     # set reg index
+            writebytes(dat)     # set reg data
+            return
+
+        cs_write = self._cs.write
+        cs_write(self.PIN_ACTIVE)
+        writebytes(cmd)     # set reg index
+        cs_write(self.PIN_INACTIVE)
+        cs_write(self.PIN_ACTIVE)
+        writebytes(dat)     # set reg data
+        cs_write(self.PIN_INACTIVE)
+
+
+    def write_gram(self, image_data):
+        """
+        Writes RGB565 data to GRAM.
+
+        Args:
+            image_data (bytes-like): 2 bytes per pixel, upper byte first.
+                                     bytes, bytearray, memoryview or
+                                     a contiguous numpy array.
+        """
+        # [ja]image()の差分元とTFTの表示が一致しなくなるので破棄する
+        # The TFT no longer matches the last frame of image().
+        self._last_rgb565 = None
+
+        image_data = memoryview(image_data).cast('B')
+        if self._cs is not None:
+            # [ja]CSを保持したままstartbyteとデータを続けて送る(コピー不要)
+            # Send the startbyte and the data while CS stays active.
+            # (no copy)
+            self._write_gram_sysfs_cs(self._GRAM_STARTBYTE, image_data)
+            return
+
+        size = len(image_data)
+        self._reserve_gram_buf(size)
+        self._gram_buf[1:1 + size] = image_data
+        self._write_gram_buf_hw_cs(size)
+
+
+    def _reserve_gram_buf(self, size):
+        if len(self._gram_buf) < 1 + size:
+            self._gram_buf = bytearray(1 + size)
+            self._gram_buf[0] = 0x72  #startbyte RS=1,R/W=W
+
+
+    def _write_gram_buf(self, size):
+        if self._cs is None:
+            self._write_gram_buf_hw_cs(size)
+        else:
+            ## startbyte RS=1,R/W=W is already at the head of the buffer.
+            self._write_gram_sysfs_cs(memoryview(self._gram_buf)[:1 + size])
+
+
+    def _write_gram_sysfs_cs(self, *send_data):
+        # set reg index
+        self._cs.write(self.PIN_ACTIVE)
+        self.spi.writebytes2(self._GRAM_HEADER)
+        self._cs.write(self.PIN_INACTIVE)
+
+        # send GRAM data
+        ## CS stays active, so the chunks are one continuous GRAM write.
+        chunk = self._spi_bufsiz
+        self._cs.write(self.PIN_ACTIVE)
+        for data in send_data:
+            for pos in range(0, len(data), chunk):
+                self.spi.writebytes2(data[pos:pos + chunk])
+        self._cs.write(self.PIN_INACTIVE)
+
+
+    def _write_gram_buf_hw_cs(self, size):
+        # set reg index
+        self.spi.writebytes2(self._GRAM_HEADER)
+
+        # [ja]CSが立ち下がる度にstartbyteが必要なので、各チャンクの直前の
+        # [ja]1byteを一時的にstartbyteに置き換えて送る(コピー不要)
+        # A startbyte is required at every CS falling edge, so the byte
+        # just before each chunk is temporarily replaced by the startbyte
+        # (no copy). Chunks hold an even number of bytes (whole pixels).
+        buf = self._gram_buf
+        view = memoryview(buf)
+        chunk = (self._spi_bufsiz - 1) & ~1
+        end = 1 + size
+        for pos in range(0, size, chunk):
+            saved = buf[pos]
+            buf[pos] = 0x72  #startbyte RS=1,R/W=W
+            try:
+                self.spi.writebytes2(view[pos:min(pos + 1 + chunk, end)])
+            finally:
+                buf[pos] = saved
 
     
     def init_ili9328(self):
+        # [ja]リセットでGRAMが消えるので、image()の差分元を破棄する
+        # The reset clears GRAM, so discard the last frame of image().
+        self._last_rgb565 = None
+
         # init spi cs pin.
-        with open(self.spi_cs_pin, mode='wb',buffering=0) as cs_pin:
-            cs_pin.write(self.PIN_INACTIVE)
+        if self._cs is not None:
+            self._cs.write(self.PIN_INACTIVE)
         
         # Reset ILI9328
         with open(self.reset_pin, mode='wb',buffering=0) as rst_pin:
@@ -216,63 +927,9 @@ class Ili9328Spi:
             time.sleep(0.05)
         
         # init ILI9328
-        # -------------- Start Initial Sequence ----------
-        self.write_cmd(0x0001, 0x0100)  # set SS and SM bit
-        self.write_cmd(0x0002, 0x0700)  # set 1 line inversion
-        self.write_cmd(0x0003, 0x1030)  # set GRAM write direction and BGR=1.
-        self.write_cmd(0x0004, 0x0000)  # Resize register
-        self.write_cmd(0x0008, 0x0207)  # set the back porch and front porch
-        self.write_cmd(0x0009, 0x0000)  # set non-display area refresh cycle ISC[3:0]
-        self.write_cmd(0x000A, 0x0000)  # FMARK function
-        self.write_cmd(0x000C, 0x0000)  # RGB interface setting
-        self.write_cmd(0x000D, 0x0000)  # Frame marker Position
-        self.write_cmd(0x000F, 0x0000)  # RGB interface polarity
-        # -------------- Power On sequence ---------------
-        self.write_cmd(0x0010, 0x0000)  # SAP, BT[3:0], AP, DSTB, SLP, STB
-        self.write_cmd(0x0011, 0x0007)  # DC1[2:0], DC0[2:0], VC[2:0]
-        self.write_cmd(0x0012, 0x0000)  # VREG1OUT voltage
-        self.write_cmd(0x0013, 0x0000)  # VDV[4:0] for VCOM amplitude
-        self.write_cmd(0x0007, 0x0001)  # Dis-charge capacitor power voltage
-        time.sleep(0.2)
-        self.write_cmd(0x0010, 0x1490)  # SAP, BT[3:0], AP, DSTB, SLP, STB
-        self.write_cmd(0x0011, 0x0227)  # DC1[2:0], DC0[2:0], VC[2:0]
-        time.sleep(0.05)                # Delay 50ms
-        self.write_cmd(0x0012, 0x001C)  # Internal reference voltage= Vci;
-        time.sleep(0.05)                # Delay 50ms
-        self.write_cmd(0x0013, 0x1A00)  # Set VDV[4:0] for VCOM amplitude
-        self.write_cmd(0x0029, 0x0025)  # Set VCM[5:0] for VCOMH
-        self.write_cmd(0x002B, 0x000C)  # Set Frame Rate
-        time.sleep(0.05)                # Delay 50ms
-        self.write_cmd(0x0020, 0x0000)  # GRAM horizontal Address
-        self.write_cmd(0x0021, 0x0000)  # GRAM Vertical Address
-        # -------------- Adjust the Gamma  Curve ---------
-        self.write_cmd(0x0030, 0x0000)
-        self.write_cmd(0x0031, 0x0506)
-        self.write_cmd(0x0032, 0x0104)
-        self.write_cmd(0x0035, 0x0207)
-        self.write_cmd(0x0036, 0x000F)
-        self.write_cmd(0x0037, 0x0306)
-        self.write_cmd(0x0038, 0x0102)
-        self.write_cmd(0x0039, 0x0707)
-        self.write_cmd(0x003C, 0x0702)
-        self.write_cmd(0x003D, 0x1604)
-        # -------------- Set GRAM area -------------------
-        self.write_cmd(0x0050, 0x0000)  # Horizontal GRAM Start Address
-        self.write_cmd(0x0051, 0x00EF)  # Horizontal GRAM End Address
-        self.write_cmd(0x0052, 0x0000)  # Vertical GRAM Start Address
-        self.write_cmd(0x0053, 0x013F)  # Vertical GRAM End Address 
-        self.write_cmd(0x0060, 0xA700)  # Gate Scan Line
-        self.write_cmd(0x0061, 0x0001)  # NDL,VLE, REV
-        self.write_cmd(0x006A, 0x0000)  # set scrolling line
-        # -------------- Partial Display Control ---------
-        self.write_cmd(0x0080, 0x0000)
-        self.write_cmd(0x0081, 0x0000)
-        self.write_cmd(0x0082, 0x0000)
-        self.write_cmd(0x0083, 0x0000)
-        self.write_cmd(0x0084, 0x0000)
-        self.write_cmd(0x0085, 0x0000)
-        # -------------- Panel Control -------------------
-        self.write_cmd(0x0090, 0x0010)
-        self.write_cmd(0x0092, 0x0600)
-        # -------------- Power On sequence ---------------
-        self.write_cmd(0x0007, 0x0133)  # 262K color and display ON 
+        for regaddr, data16, delay in self._INIT_SEQ:
+            if regaddr == 0x0003:
+                data16 = self._ENTRY_MODE[self.ORIENTATION]
+            self._write_cmd_pair(regaddr, data16)
+            if delay:
+                time.sleep(delay)